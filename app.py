@@ -1,96 +1,520 @@
 import streamlit as st
 import numpy as np
-import librosa
-import noisereduce as nr
 import soundfile as sf
 import io
+import hashlib
 import tempfile
 import os
-from scipy.io import wavfile
-import matplotlib.pyplot as plt
+from numba import njit, prange
 
-def load_audio(uploaded_file):
-    """Load audio file and return audio data and sample rate"""
+# librosa, noisereduce, scipy, pandas and altair are imported inside the
+# functions that use them so the first page renders without paying for them
+
+# Uploads above this size are streamed block by block instead of decoded into memory
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+STREAM_BLOCK_SECONDS = 30
+# Twice the padding noisereduce uses between its own internal chunks, so each
+# side of a block seam keeps that much context once the overlap is split
+STREAM_OVERLAP = 2 * 30000
+ENVELOPE_BINS = 2000
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _mono_normalize(x2d, out, target_peak):
+    """Downmix (frames x channels) audio into out and scale it to target_peak in one pass"""
+    n_frames, n_channels = x2d.shape
+    inv_channels = 1.0 / n_channels
+    peak = 0.0
+    
+    # Downmix and track the peak in the same streaming pass
+    for i in prange(n_frames):
+        v = 0.0
+        for c in range(n_channels):
+            v += x2d[i, c]
+        v *= inv_channels
+        out[i] = v
+        peak = max(peak, abs(v))
+    
+    # Scale in place; silent audio is left untouched
+    if peak > 0.0:
+        gain = target_peak / peak
+        for i in prange(n_frames):
+            out[i] *= gain
+    
+    return peak
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _levels(x):
+    """Return the sum of squares and peak of x in a single pass"""
+    sum_sq = 0.0
+    peak = 0.0
+    for i in prange(len(x)):
+        v = x[i]
+        sum_sq += v * v
+        peak = max(peak, abs(v))
+    return sum_sq, peak
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _paired_levels(a, b):
+    """Return sum of squares and peak of two arrays, reading both in one pass"""
+    n = min(len(a), len(b))
+    sum_sq_a = 0.0
+    peak_a = 0.0
+    sum_sq_b = 0.0
+    peak_b = 0.0
+    for i in prange(n):
+        va = a[i]
+        vb = b[i]
+        sum_sq_a += va * va
+        peak_a = max(peak_a, abs(va))
+        sum_sq_b += vb * vb
+        peak_b = max(peak_b, abs(vb))
+    
+    # Handle any length mismatch between the two arrays
+    for i in prange(n, len(a)):
+        va = a[i]
+        sum_sq_a += va * va
+        peak_a = max(peak_a, abs(va))
+    for i in prange(n, len(b)):
+        vb = b[i]
+        sum_sq_b += vb * vb
+        peak_b = max(peak_b, abs(vb))
+    
+    return sum_sq_a, peak_a, sum_sq_b, peak_b
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _decode_bytes(audio_bytes):
+    """Decode raw audio file bytes into mono, peak-normalized audio data and sample rate"""
+    # Decode straight from memory with soundfile (WAV, FLAC, OGG and, with
+    # recent libsndfile, MP3) to avoid a disk round-trip
     try:
-        # Create a temporary file to save the uploaded audio
+        audio_data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=True)
+        
+    except sf.LibsndfileError:
+        # Fall back to librosa for formats libsndfile can't decode (e.g. M4A).
+        # audioread needs a real file path, so only this branch uses a temp file.
+        import librosa
+        
         with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
+            tmp_file.write(audio_bytes)
             tmp_file_path = tmp_file.name
         
-        # Load audio using librosa with error handling
         try:
-            audio_data, sample_rate = librosa.load(tmp_file_path, sr=None)
-            
-            # Ensure audio is mono (convert stereo to mono if needed)
-            if audio_data.ndim > 1:
-                audio_data = np.mean(audio_data, axis=0)
-            
-            # Normalize audio data
-            if np.max(np.abs(audio_data)) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-            
-        except Exception as e:
-            st.error(f"Error with librosa, trying alternative method: {str(e)}")
-            # Fallback to soundfile
-            audio_data, sample_rate = sf.read(tmp_file_path)
-            if audio_data.ndim > 1:
-                audio_data = np.mean(audio_data, axis=1)
-            if np.max(np.abs(audio_data)) > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-        
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
-        
-        return audio_data, sample_rate
-        
+            audio_data, sample_rate = librosa.load(tmp_file_path, sr=None, mono=True, dtype=np.float32)
+        finally:
+            # Clean up temporary file
+            os.unlink(tmp_file_path)
+    
+    # Ensure audio is mono and normalize it in a single pass
+    if audio_data.ndim == 1:
+        audio_data = audio_data[:, np.newaxis]
+    mono = np.empty(audio_data.shape[0], dtype=np.float32)
+    _mono_normalize(audio_data, mono, 1.0)
+    
+    return mono, sample_rate
+
+def load_audio(uploaded_file):
+    """Load audio file and return audio data and sample rate"""
+    # Decoding is cached on the file contents so widget changes don't re-decode.
+    # Errors are caught here rather than in the cached function so a failed
+    # decode isn't cached.
+    try:
+        return _decode_bytes(uploaded_file.getvalue())
     except Exception as e:
         st.error(f"Error loading audio file: {str(e)}")
         return None, None
 
+def _is_pcm16_wav(audio_bytes):
+    """Check whether raw file bytes are a 16-bit PCM WAV that can be played as uploaded"""
+    try:
+        info = sf.info(io.BytesIO(audio_bytes))
+    except sf.LibsndfileError:
+        return False
+    return info.format == 'WAV' and info.subtype == 'PCM_16'
+
+def _audio_hash(audio_data):
+    """Return a cheap content hash of an audio array for use as a cache key"""
+    return hashlib.blake2b(audio_data.tobytes(), digest_size=8).hexdigest()
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _mix(gated, passthrough, prop_decrease, out):
+    """Blend fully gated and ungated audio: out = p * gated + (1 - p) * passthrough"""
+    keep = 1.0 - prop_decrease
+    for i in prange(len(out)):
+        out[i] = prop_decrease * gated[i] + keep * passthrough[i]
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _subtract_noise(mag, noise_mag, alpha):
+    """Half-wave rectified spectral subtraction in place: |X| = max(|Y| - alpha * |V|, 0)"""
+    # mag is frames x bins, so each frame's bins are contiguous in the inner loop
+    n_frames, n_bins = mag.shape
+    for f in prange(n_frames):
+        for k in range(n_bins):
+            mag[f, k] = max(mag[f, k] - alpha * noise_mag[k], 0.0)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _gate_components(audio_hash, _audio_data, sample_rate, stationary):
+    """Compute the full-strength and zero-strength noisereduce outputs for blending"""
+    import noisereduce as nr
+    import scipy.fft
+    
+    # noisereduce applies prop_decrease as mask * p + (1 - p) before a linear
+    # smoothing and inverse STFT, so its output for any p is the same blend of
+    # these two signals. Caching them on the audio hash means strength changes
+    # never re-run the STFT or noise profile estimation.
+    # noisereduce already splits the signal into padded chunks (its default
+    # chunk_size), stitches them and computes the stationary noise profile
+    # once up front, so for inputs of a minute or more the chunks can run on
+    # every core. chunk_size is left alone: it also sets the noise profile
+    # window and the per-chunk dB floor, so changing it changes the output.
+    n_jobs = -1 if len(_audio_data) >= 60 * sample_rate else 1
+    
+    def reduce(prop_decrease):
+        # Let pocketfft spread the STFTs over all cores when chunks run in this thread
+        with scipy.fft.set_workers(-1):
+            return nr.reduce_noise(
+                y=_audio_data, 
+                sr=sample_rate,
+                stationary=stationary,
+                prop_decrease=prop_decrease,
+                n_jobs=n_jobs
+            )
+    
+    # Apply noise reduction at full strength
+    gated = reduce(1.0)
+    
+    # With no reduction the non-stationary gate reconstructs the input exactly,
+    # but the stationary mask smoothing still shapes the spectrum edges
+    passthrough = reduce(0.0) if stationary else _audio_data
+    
+    return gated, passthrough
+
 def remove_noise(audio_data, sample_rate, stationary=True, prop_decrease=1.0):
     """Remove noise from audio using noisereduce library"""
     try:
-        # Apply noise reduction
-        reduced_noise = nr.reduce_noise(
-            y=audio_data, 
-            sr=sample_rate,
-            stationary=stationary,
-            prop_decrease=prop_decrease
+        # Keep the whole STFT pipeline in float32; float64 doubles its memory traffic
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        gated, passthrough = _gate_components(
+            _audio_hash(audio_data),
+            audio_data,
+            sample_rate,
+            stationary
         )
+        
+        reduced_noise = np.empty(len(gated), dtype=np.float32)
+        _mix(gated, passthrough, prop_decrease, reduced_noise)
         return reduced_noise
     except Exception as e:
         st.error(f"Error removing noise: {str(e)}")
         return None
 
+@njit(parallel=True, fastmath=True, cache=True)
+def _overlap_add(frames, window, hop_length, out):
+    """Weighted overlap-add of (frames x n_fft) into out, normalized by the summed squared window"""
+    n_frames, n_fft = frames.shape
+    n_segments = (len(out) + hop_length - 1) // hop_length
+    frames_per_segment = (n_fft + hop_length - 1) // hop_length
+    
+    # Each hop-sized output segment is owned by one iteration, so no writes race
+    for j in prange(n_segments):
+        seg_start = j * hop_length
+        seg_end = min(seg_start + hop_length, len(out))
+        first = max(0, j - frames_per_segment + 1)
+        last = min(j + 1, n_frames)
+        for pos in range(seg_start, seg_end):
+            acc = 0.0
+            norm = 0.0
+            for f in range(first, last):
+                offset = pos - f * hop_length
+                if offset < n_fft:
+                    w = window[offset]
+                    acc += frames[f, offset] * w
+                    norm += w * w
+            out[pos] = acc / norm if norm > 1e-10 else 0.0
+
+def spectral_subtract(audio_data, sample_rate, prop_decrease=1.0, n_fft=2048, hop_length=512, noise_seconds=0.5):
+    """Remove stationary noise by spectral subtraction, estimating the noise from the opening"""
+    import scipy.fft
+    import scipy.signal
+    
+    try:
+        # Keep the whole STFT pipeline in float32; float64 doubles its memory traffic
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        window = scipy.signal.get_window('hann', n_fft).astype(np.float32)
+        
+        # Frame the centered signal as a strided view and take one batched
+        # real-input FFT over all frames, with pocketfft using every core.
+        # The tail is zero-padded to a whole number of hops so the last
+        # samples get as many overlapping frames as the rest.
+        tail = (-(len(audio_data) + 2 * (n_fft // 2) - n_fft)) % hop_length
+        padded = np.pad(audio_data, (n_fft // 2, n_fft // 2 + tail))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+        stft = scipy.fft.rfft(frames * window, axis=-1, workers=-1)
+        mag = np.abs(stft)
+        phase = stft / (mag + 1e-12)
+        
+        # Average noise magnitude per frequency bin over the first noise_seconds
+        n_noise_frames = max(1, int(noise_seconds * sample_rate / hop_length))
+        noise_mag = mag[:n_noise_frames].mean(axis=0)
+        
+        # Subtract the noise floor, then rebuild with the noisy phase
+        _subtract_noise(mag, noise_mag, prop_decrease)
+        cleaned_frames = scipy.fft.irfft(mag * phase, n=n_fft, axis=-1, workers=-1)
+        
+        cleaned = np.empty(len(padded), dtype=np.float32)
+        _overlap_add(cleaned_frames, window, hop_length, cleaned)
+        return cleaned[n_fft // 2:n_fft // 2 + len(audio_data)]
+    except Exception as e:
+        st.error(f"Error removing noise: {str(e)}")
+        return None
+
+def _envelope(audio_data, sample_rate, n_pix=ENVELOPE_BINS):
+    """Decimate audio to per-bin min/max envelopes for plotting"""
+    n_bins = min(n_pix, len(audio_data))
+    bins = np.linspace(0, len(audio_data), n_bins + 1).astype(np.int64)
+    idx = bins[:-1]
+    env_min = np.minimum.reduceat(audio_data, idx)
+    env_max = np.maximum.reduceat(audio_data, idx)
+    time = (bins[:-1] + bins[1:]) / (2 * sample_rate)
+    return time, env_min, env_max
+
+def _block_envelope(block, start, bin_size, sample_rate):
+    """Min/max envelope of one streamed block, timed relative to the whole file"""
+    idx = np.arange(0, len(block), bin_size)
+    ends = np.minimum(idx + bin_size, len(block))
+    time = (2 * start + idx + ends) / (2 * sample_rate)
+    return time, np.minimum.reduceat(block, idx), np.maximum.reduceat(block, idx)
+
+def _join_envelopes(parts):
+    """Concatenate per-block envelopes into one (time, min, max) envelope"""
+    return tuple(np.concatenate(part) for part in zip(*parts))
+
+@st.cache_resource
+def _waveform_chart():
+    """Build the waveform chart spec once; callers only swap in data and a title"""
+    import altair as alt
+    
+    return alt.Chart().mark_area().encode(
+        x=alt.X('time', title='Time (seconds)'),
+        y=alt.Y('min', title='Amplitude'),
+        y2='max'
+    )
+
+def plot_envelope(time, env_min, env_max, title):
+    """Create a waveform chart from a min/max envelope"""
+    import pandas as pd
+    
+    envelope_df = pd.DataFrame({'time': time, 'min': env_min, 'max': env_max})
+    # properties() returns a copy, so the cached base chart is never mutated
+    return _waveform_chart().properties(data=envelope_df, title=title)
+
 def create_audio_plot(audio_data, sample_rate, title):
-    """Create a waveform plot of the audio"""
-    fig, ax = plt.subplots(figsize=(12, 4))
-    time = np.linspace(0, len(audio_data) / sample_rate, len(audio_data))
-    ax.plot(time, audio_data)
-    ax.set_title(title)
-    ax.set_xlabel('Time (seconds)')
-    ax.set_ylabel('Amplitude')
-    ax.grid(True, alpha=0.3)
-    return fig
+    """Create a waveform chart of the audio"""
+    # Only ~2 points per pixel are visible, so plot a min/max envelope
+    time, env_min, env_max = _envelope(audio_data, sample_rate)
+    return plot_envelope(time, env_min, env_max, title)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _scan_audio(audio_bytes):
+    """Stream through a large file once to get its sample rate, length, levels and envelope"""
+    try:
+        info = sf.info(io.BytesIO(audio_bytes))
+    except sf.LibsndfileError:
+        # Not streamable with libsndfile; the caller falls back to in-memory loading
+        return None
+    
+    sample_rate = info.samplerate
+    bin_size = max(1, info.frames // ENVELOPE_BINS)
+    peak = 0.0
+    sum_sq = 0.0
+    parts = []
+    n_frames = 0
+    
+    for block in sf.blocks(io.BytesIO(audio_bytes), blocksize=STREAM_BLOCK_SECONDS * sample_rate,
+                           dtype='float32', always_2d=True):
+        mono = np.mean(block, axis=1)
+        block_sum_sq, block_peak = _levels(mono)
+        sum_sq += block_sum_sq
+        peak = max(peak, block_peak)
+        parts.append(_block_envelope(mono, n_frames, bin_size, sample_rate))
+        n_frames += len(mono)
+    
+    # Report levels and envelope relative to the peak, as load_audio normalizes
+    gain = 1.0 / peak if peak > 0 else 1.0
+    time, env_min, env_max = _join_envelopes(parts)
+    envelope = (time, env_min * gain, env_max * gain)
+    rms = np.sqrt(sum_sq / max(n_frames, 1)) * gain
+    
+    return sample_rate, n_frames, gain, rms, peak * gain, envelope
 
-def audio_to_bytes(audio_data, sample_rate):
+@st.cache_data(max_entries=2, show_spinner=False)
+def _reduce_noise_streaming(audio_bytes, gain, stationary, prop_decrease, float_export):
+    """Remove noise block by block, writing the cleaned WAV incrementally"""
+    import noisereduce as nr
+    import scipy.fft
+    
+    info = sf.info(io.BytesIO(audio_bytes))
+    sample_rate = info.samplerate
+    blocksize = STREAM_BLOCK_SECONDS * sample_rate
+    half_overlap = STREAM_OVERLAP // 2
+    bin_size = max(1, info.frames // ENVELOPE_BINS)
+    
+    # Estimate the noise profile from the first 2 seconds
+    noise_clip, _ = sf.read(io.BytesIO(audio_bytes), frames=2 * sample_rate,
+                            dtype='float32', always_2d=True)
+    noise_clip = np.mean(noise_clip, axis=1) * gain
+    
+    peak = 0.0
+    sum_sq = 0.0
+    parts = []
+    n_written = 0
+    
+    def write_segment(out, segment):
+        nonlocal peak, sum_sq, n_written
+        segment_sum_sq, segment_peak = _levels(segment)
+        sum_sq += segment_sum_sq
+        peak = max(peak, segment_peak)
+        parts.append(_block_envelope(segment, n_written, bin_size, sample_rate))
+        out.write(segment)
+        n_written += len(segment)
+    
+    # The peak isn't known until every block is cleaned, so write unscaled float
+    # samples first and normalize them while encoding the final WAV below
+    scratch = io.BytesIO()
+    with sf.SoundFile(scratch, mode='w', samplerate=sample_rate, channels=1,
+                      format='WAV', subtype='FLOAT') as out:
+        pending = None
+        blocks = sf.blocks(io.BytesIO(audio_bytes), blocksize=blocksize, overlap=STREAM_OVERLAP,
+                           dtype='float32', always_2d=True)
+        for i, block in enumerate(blocks):
+            with scipy.fft.set_workers(-1):
+                cleaned = nr.reduce_noise(
+                    y=np.mean(block, axis=1) * gain,
+                    sr=sample_rate,
+                    stationary=stationary,
+                    y_noise=noise_clip,
+                    prop_decrease=prop_decrease,
+                    chunk_size=blocksize
+                )
+            
+            # Blocks overlap; keep the middle of each overlap from both sides.
+            # The previous block's tail is only trimmed once we know another block follows.
+            if pending is not None:
+                write_segment(out, pending[:len(pending) - half_overlap])
+            pending = cleaned[half_overlap:] if i > 0 else cleaned
+        
+        if pending is not None:
+            write_segment(out, pending)
+    
+    # Same peak normalization and 16-bit quantization as audio_to_bytes
+    target_peak = 0.95 if float_export else 0.95 * 32767.0
+    gain_out = target_peak / peak if peak > 0 else 1.0
+    scratch.seek(0)
+    buffer = io.BytesIO()
+    subtype = 'FLOAT' if float_export else 'PCM_16'
+    with sf.SoundFile(buffer, mode='w', samplerate=sample_rate, channels=1,
+                      format='WAV', subtype=subtype) as out:
+        for block in sf.blocks(scratch, blocksize=blocksize, dtype='float32'):
+            block *= gain_out
+            out.write(block if float_export else np.rint(block, out=block).astype(np.int16))
+    
+    rms = np.sqrt(sum_sq / max(n_written, 1))
+    return buffer.getvalue(), rms, peak, _join_envelopes(parts)
+
+def audio_to_bytes(audio_data, sample_rate, float_export=False, peak=None):
     """Convert audio data to bytes for download and playback"""
     try:
-        # Normalize audio to prevent clipping
-        if np.max(np.abs(audio_data)) > 0:
-            audio_data = audio_data / np.max(np.abs(audio_data)) * 0.95
+        # Normalize audio to prevent clipping. For 16-bit output scale straight
+        # into the int16 range so soundfile doesn't re-quantize a float buffer.
+        target_peak = 0.95 if float_export else 0.95 * 32767.0
+        scaled = np.empty(len(audio_data), dtype=np.float32)
+        if peak is None:
+            _mono_normalize(audio_data[:, np.newaxis], scaled, target_peak)
+        else:
+            # Peak already known, so a single multiply pass is enough
+            np.multiply(audio_data, target_peak / peak if peak > 0 else 1.0, out=scaled, casting='unsafe')
         
-        # Ensure audio is in the right format (float32)
-        audio_data = audio_data.astype(np.float32)
+        if float_export:
+            audio_data, subtype = scaled, 'FLOAT'
+        else:
+            # The 0.95 headroom keeps every sample inside int16 range, so no clip is needed
+            audio_data, subtype = np.rint(scaled, out=scaled).astype(np.int16), 'PCM_16'
         
         buffer = io.BytesIO()
-        sf.write(buffer, audio_data, sample_rate, format='WAV', subtype='PCM_16')
-        buffer.seek(0)
+        sf.write(buffer, audio_data, sample_rate, format='WAV', subtype=subtype)
+        # getvalue() hands back the buffer's own bytes object rather than a copy
         return buffer.getvalue()
     except Exception as e:
         st.error(f"Error converting audio: {str(e)}")
         return None
 
+def process_large_file(uploaded_file, summary, stationary_noise, prop_decrease, float_export):
+    """Show and process a large upload block by block instead of decoding it into memory"""
+    sample_rate, n_frames, gain, original_rms, original_peak, original_envelope = summary
+    duration = n_frames / sample_rate
+    st.success(f"✅ Large audio file scanned! Duration: {duration:.2f} seconds, Sample Rate: {sample_rate} Hz")
+    st.info(f"Large file mode: audio is processed in {STREAM_BLOCK_SECONDS} second blocks with noisereduce to limit memory use. "
+            "Fast mode isn't available for large files, so the Quality setting is always used.")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("🔊 Original Audio")
+        
+        # Play the upload as-is rather than decoding and re-encoding it
+        st.audio(uploaded_file.getvalue(), format=uploaded_file.type)
+        
+        # Plot original waveform
+        chart_original = plot_envelope(*original_envelope, "Original Audio Waveform")
+        st.altair_chart(chart_original, use_container_width=True)
+    
+    # Process audio when button is clicked
+    if st.button("🎯 Remove Noise", type="primary"):
+        with col2:
+            st.subheader("🔇 Noise Reduced Audio")
+            
+            with st.spinner("Removing noise block by block... This may take a while."):
+                try:
+                    result = _reduce_noise_streaming(
+                        uploaded_file.getvalue(),
+                        gain,
+                        stationary_noise,
+                        prop_decrease,
+                        float_export
+                    )
+                except Exception as e:
+                    st.error(f"Error removing noise: {str(e)}")
+                    result = None
+            
+            if result is not None:
+                cleaned_bytes, cleaned_rms, cleaned_peak, cleaned_envelope = result
+                st.success("✅ Noise removal completed!")
+                
+                st.audio(cleaned_bytes, format='audio/wav')
+                st.download_button(
+                    label="📥 Download Cleaned Audio",
+                    data=cleaned_bytes,
+                    file_name=f"cleaned_{uploaded_file.name.split('.')[0]}.wav",
+                    mime="audio/wav"
+                )
+                
+                # Plot cleaned waveform
+                chart_cleaned = plot_envelope(*cleaned_envelope, "Noise Reduced Audio Waveform")
+                st.altair_chart(chart_cleaned, use_container_width=True)
+                
+                # Audio statistics
+                st.subheader("📊 Audio Statistics")
+                stats_col1, stats_col2 = st.columns(2)
+                
+                with stats_col1:
+                    st.metric("Original RMS", f"{original_rms:.4f}")
+                    st.metric("Original Peak", f"{original_peak:.4f}")
+                
+                with stats_col2:
+                    st.metric("Cleaned RMS", f"{cleaned_rms:.4f}")
+                    st.metric("Cleaned Peak", f"{cleaned_peak:.4f}")
+            else:
+                st.error("Failed to process audio. Please try with different settings.")
+
 def main():
     st.set_page_config(
         page_title="Audio Noise Removal Tool",
@@ -105,6 +529,14 @@ def main():
     st.sidebar.header("Noise Reduction Settings")
     
     # Noise reduction parameters
+    processing_mode = st.sidebar.radio(
+        "Processing Mode",
+        ["Quality (noisereduce)", "Fast (spectral subtraction)"],
+        help="Fast mode subtracts a noise estimate taken from the first half second and always treats noise as stationary. "
+             f"Files over {LARGE_FILE_BYTES // (1024 * 1024)} MB always use Quality mode."
+    )
+    fast_mode = processing_mode.startswith("Fast")
+    
     stationary_noise = st.sidebar.checkbox(
         "Stationary Noise", 
         value=True,
@@ -120,6 +552,12 @@ def main():
         help="How much to reduce the noise (higher = more aggressive)"
     )
     
+    float_export = st.sidebar.checkbox(
+        "32-bit Float Export",
+        value=False,
+        help="Download cleaned audio as 32-bit float WAV instead of 16-bit PCM"
+    )
+    
     # File upload
     uploaded_file = st.file_uploader(
         "Choose an audio file",
@@ -131,9 +569,27 @@ def main():
         # Display file info
         st.info(f"📁 Uploaded: {uploaded_file.name} ({uploaded_file.size / 1024:.1f} KB)")
         
-        # Load audio
-        with st.spinner("Loading audio file..."):
-            audio_data, sample_rate = load_audio(uploaded_file)
+        # Large uploads that libsndfile can stream are processed block by block
+        summary = None
+        scan_failed = False
+        if uploaded_file.size > LARGE_FILE_BYTES:
+            with st.spinner("Scanning large audio file..."):
+                # Caught here rather than in the cached scan so failures aren't cached
+                try:
+                    summary = _scan_audio(uploaded_file.getvalue())
+                except Exception as e:
+                    st.error(f"Error loading audio file: {str(e)}")
+                    scan_failed = True
+        
+        if summary is not None:
+            process_large_file(uploaded_file, summary, stationary_noise, prop_decrease, float_export)
+            audio_data = None
+        elif scan_failed:
+            audio_data = None
+        else:
+            # Load audio
+            with st.spinner("Loading audio file..."):
+                audio_data, sample_rate = load_audio(uploaded_file)
         
         if audio_data is not None:
             # Display original audio info
@@ -148,7 +604,12 @@ def main():
                 
                 # Play original audio
                 try:
-                    original_bytes = audio_to_bytes(audio_data, sample_rate)
+                    if _is_pcm16_wav(uploaded_file.getvalue()):
+                        # Already a format the browser plays, so skip decoding and re-encoding
+                        original_bytes = uploaded_file.getvalue()
+                    else:
+                        # load_audio has already normalized the audio to a peak of 1
+                        original_bytes = audio_to_bytes(audio_data, sample_rate, peak=1.0)
                     if original_bytes:
                         st.audio(original_bytes, format='audio/wav')
                     else:
@@ -157,9 +618,8 @@ def main():
                     st.error(f"Error playing original audio: {str(e)}")
                 
                 # Plot original waveform
-                fig_original = create_audio_plot(audio_data, sample_rate, "Original Audio Waveform")
-                st.pyplot(fig_original)
-                plt.close()
+                chart_original = create_audio_plot(audio_data, sample_rate, "Original Audio Waveform")
+                st.altair_chart(chart_original, use_container_width=True)
             
             # Process audio when button is clicked
             if st.button("🎯 Remove Noise", type="primary"):
@@ -167,19 +627,39 @@ def main():
                     st.subheader("🔇 Noise Reduced Audio")
                     
                     with st.spinner("Removing noise... This may take a moment."):
-                        cleaned_audio = remove_noise(
-                            audio_data, 
-                            sample_rate, 
-                            stationary=stationary_noise,
-                            prop_decrease=prop_decrease
-                        )
+                        if fast_mode:
+                            cleaned_audio = spectral_subtract(
+                                audio_data,
+                                sample_rate,
+                                prop_decrease=prop_decrease
+                            )
+                        else:
+                            cleaned_audio = remove_noise(
+                                audio_data, 
+                                sample_rate, 
+                                stationary=stationary_noise,
+                                prop_decrease=prop_decrease
+                            )
                     
                     if cleaned_audio is not None:
                         st.success("✅ Noise removal completed!")
                         
+                        # One pass gets the levels for the statistics panel and the
+                        # cleaned peak, which saves audio_to_bytes its own peak scan
+                        original_sum_sq, original_peak, cleaned_sum_sq, cleaned_peak = _paired_levels(
+                            audio_data, cleaned_audio
+                        )
+                        
+                        # Encode once; playback and both download buttons share these bytes
+                        cleaned_bytes = audio_to_bytes(
+                            cleaned_audio,
+                            sample_rate,
+                            float_export=float_export,
+                            peak=cleaned_peak
+                        )
+                        
                         # Play cleaned audio
                         try:
-                            cleaned_bytes = audio_to_bytes(cleaned_audio, sample_rate)
                             if cleaned_bytes:
                                 st.audio(cleaned_bytes, format='audio/wav')
                                 
@@ -196,7 +676,6 @@ def main():
                             st.error(f"Error playing cleaned audio: {str(e)}")
                             # Still try to provide download even if playback fails
                             try:
-                                cleaned_bytes = audio_to_bytes(cleaned_audio, sample_rate)
                                 if cleaned_bytes:
                                     st.download_button(
                                         label="📥 Download Cleaned Audio (Playback Error)",
@@ -209,9 +688,8 @@ def main():
                         
                         # Plot cleaned waveform
                         try:
-                            fig_cleaned = create_audio_plot(cleaned_audio, sample_rate, "Noise Reduced Audio Waveform")
-                            st.pyplot(fig_cleaned)
-                            plt.close()
+                            chart_cleaned = create_audio_plot(cleaned_audio, sample_rate, "Noise Reduced Audio Waveform")
+                            st.altair_chart(chart_cleaned, use_container_width=True)
                         except Exception as e:
                             st.error(f"Error plotting cleaned audio: {str(e)}")
                         
@@ -220,12 +698,12 @@ def main():
                         stats_col1, stats_col2 = st.columns(2)
                         
                         with stats_col1:
-                            st.metric("Original RMS", f"{np.sqrt(np.mean(audio_data**2)):.4f}")
-                            st.metric("Original Peak", f"{np.max(np.abs(audio_data)):.4f}")
+                            st.metric("Original RMS", f"{np.sqrt(original_sum_sq / len(audio_data)):.4f}")
+                            st.metric("Original Peak", f"{original_peak:.4f}")
                         
                         with stats_col2:
-                            st.metric("Cleaned RMS", f"{np.sqrt(np.mean(cleaned_audio**2)):.4f}")
-                            st.metric("Cleaned Peak", f"{np.max(np.abs(cleaned_audio)):.4f}")
+                            st.metric("Cleaned RMS", f"{np.sqrt(cleaned_sum_sq / len(cleaned_audio)):.4f}")
+                            st.metric("Cleaned Peak", f"{cleaned_peak:.4f}")
                     else:
                         st.error("Failed to process audio. Please try with different settings.")
     
@@ -253,6 +731,7 @@ def main():
         This tool uses advanced noise reduction algorithms:
         - **Spectral Gating**: Identifies and reduces noise based on spectral analysis
         - **Stationary vs Non-stationary**: Different algorithms for different noise types
+        - **Fast Mode**: Plain spectral subtraction of a noise estimate from the start of the recording
         - **Adaptive Processing**: Preserves speech quality while removing noise
         
         **Supported Audio Formats:**